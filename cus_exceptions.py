@@ -8,3 +8,7 @@ class CidRetrievalError(Exception):
 
 class VideoNotFoundError(Exception):
     pass
+
+
+class DownloadCancelledError(Exception):
+    pass
@@ -1,19 +1,44 @@
 import os
 import re
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Event, Lock
+from typing import Any, Optional
 import requests
+from requests.exceptions import RequestException
 from tqdm import tqdm
+from tqdm.utils import CallbackIOWrapper
 import ffmpeg
 import shlex
 
+from cus_exceptions import DownloadCancelledError
 from session import session  # 你的登录 session
 
+# Windows 下非法字符：\/:*?"<>| 另外我们把 / 也替换掉
+_FN_BAD = re.compile(r'[\\/:*?"<>|]')
 
-def download_video(bvid: str, title: str, video_url: str) -> str:
+# 进度条攒够 16 MiB 或超过 100 ms 才刷新一次
+_PBAR_FLUSH_BYTES = 16 * 1024 * 1024
+_PBAR_FLUSH_SECS = 0.1
+
+# 单个区间中途断开后，剩余部分最多重新排队的次数
+_RANGE_RETRIES = 1
+
+# 临时目录和默认输出目录只在导入时建一次
+_TEMP_DIR = "temp"
+_OUTPUT_DIR = "output"
+os.makedirs(_TEMP_DIR, exist_ok=True)
+os.makedirs(_OUTPUT_DIR, exist_ok=True)
+
+
+def download_video(
+    bvid: str, title: str, video_url: str, stop: Optional[Event] = None
+) -> str:
     """
-    带进度条的分块下载视频
+    带进度条的多连接分段下载视频
     """
-    out_dir = "temp"
-    os.makedirs(out_dir, exist_ok=True)
+    out_dir = _TEMP_DIR
     safe_title = _sanitize_filename(title)
     path = os.path.join(out_dir, f"{safe_title}_video_only.mp4")
 
@@ -22,39 +47,22 @@ def download_video(bvid: str, title: str, video_url: str) -> str:
         "User-Agent": session.headers.get("User-Agent"),
     }
 
-    # 先发 HEAD 请求拿 Content-Length
-    total = int(
-        session.head(video_url, headers=headers).headers.get("Content-Length", 0)
+    parallel_download(
+        video_url, path, headers, desc=f"下载视频 {safe_title}", stop=stop
     )
 
-    with session.get(video_url, headers=headers, stream=True) as resp:
-        resp.raise_for_status()
-        with (
-            open(path, "wb") as f,
-            tqdm(
-                total=total,
-                unit="B",
-                unit_scale=True,
-                unit_divisor=1024,
-                desc=f"下载视频 {safe_title}",
-            ) as pbar,
-        ):
-            for chunk in resp.iter_content(chunk_size=1024 * 1024):
-                if not chunk:
-                    continue
-                f.write(chunk)
-                pbar.update(len(chunk))
-
-    print(f"\n✅ 视频已保存到 {path}")
+    # 另一路下载的进度条可能还在刷新，用 tqdm.write 避免把它打乱
+    tqdm.write(f"✅ 视频已保存到 {path}")
     return path
 
 
-def download_audio(bvid: str, title: str, audio_url: str) -> str:
+def download_audio(
+    bvid: str, title: str, audio_url: str, stop: Optional[Event] = None
+) -> str:
     """
-    带进度条的分块下载音频
+    带进度条的多连接分段下载音频
     """
-    out_dir = "temp"
-    os.makedirs(out_dir, exist_ok=True)
+    out_dir = _TEMP_DIR
     safe_title = _sanitize_filename(title)
     path = os.path.join(out_dir, f"{safe_title}_audio_only.mp3")
 
@@ -63,56 +71,296 @@ def download_audio(bvid: str, title: str, audio_url: str) -> str:
         "User-Agent": session.headers.get("User-Agent"),
     }
 
-    total = int(
-        session.head(audio_url, headers=headers).headers.get("Content-Length", 0)
+    parallel_download(
+        audio_url, path, headers, desc=f"下载音频 {safe_title}", stop=stop
     )
 
-    with session.get(audio_url, headers=headers, stream=True) as resp:
-        resp.raise_for_status()
-        with (
-            open(path, "wb") as f,
-            tqdm(
-                total=total,
-                unit="B",
-                unit_scale=True,
-                unit_divisor=1024,
-                desc=f"下载音频 {safe_title}",
-            ) as pbar,
-        ):
-            for chunk in resp.iter_content(chunk_size=1024 * 1024):
-                if not chunk:
-                    continue
-                f.write(chunk)
-                pbar.update(len(chunk))
-
-    print(f"\n✅ 音频已保存到 {path}")
+    # 另一路下载的进度条可能还在刷新，用 tqdm.write 避免把它打乱
+    tqdm.write(f"✅ 音频已保存到 {path}")
     return path
 
 
+def parallel_download(
+    url: str,
+    path: str,
+    headers: dict[str, Any],
+    n: int = 6,
+    chunk: int = 8 * 1024 * 1024,
+    desc: Optional[str] = None,
+    stop: Optional[Event] = None,
+) -> None:
+    """
+    开 n 条连接并发 Range 请求，按偏移 pwrite 到同一个文件。
+    服务器不支持 Range 或拿不到总长度时退回单连接流式下载。
+    stop 由调用方持有，置位后各 worker 尽快停下并抛出 DownloadCancelledError。
+    """
+    if stop is None:
+        stop = Event()
+    if not hasattr(os, "pwrite"):
+        _stream_download(url, path, headers, desc, stop)
+        return
+
+    # 第一段直接当作 Range 探测，总长度从 Content-Range 里拿，省掉一次 HEAD
+    with session.get(
+        url, headers={**headers, "Range": f"bytes=0-{chunk - 1}"}, stream=True
+    ) as probe:
+        if probe.status_code != 206:
+            # 返回 200 说明服务器忽略了 Range，直接把这个响应当单连接下载
+            probe.raise_for_status()
+            _write_stream(probe, path, desc, stop)
+            return
+
+        total = _content_range_total(probe.headers.get("Content-Range", ""))
+        if total is None:
+            probe.close()
+            _stream_download(url, path, headers, desc, stop)
+            return
+
+        # 剩下的区间丢进队列，worker 各自领取；第三项是还能重新排队的次数
+        ranges: queue.Queue[tuple[int, int, int]] = queue.Queue()
+        for start in range(chunk, total, chunk):
+            ranges.put((start, min(start + chunk, total) - 1, _RANGE_RETRIES))
+
+        lock = Lock()
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            # 预分配文件大小，各段直接写到自己的偏移上
+            _preallocate(fd, total)
+            with (
+                tqdm(
+                    total=total,
+                    unit="B",
+                    unit_scale=True,
+                    unit_divisor=1024,
+                    mininterval=0.2,
+                    desc=desc,
+                ) as pbar,
+                ThreadPoolExecutor(max_workers=n) as pool,
+            ):
+                # 探测响应的第一段也交给线程池，和其它区间同时下载
+                probe_end = min(chunk, total) - 1
+                worker_args = (url, headers, fd, ranges, pbar, lock, stop)
+                futures = [pool.submit(_probe_worker, probe, probe_end, *worker_args)]
+                futures += [
+                    pool.submit(_range_worker, *worker_args) for _ in range(n - 1)
+                ]
+                try:
+                    for fut in as_completed(futures):
+                        fut.result()
+                except BaseException:
+                    # 任一区间失败就让其它 worker 尽快停下，不用等整个文件下完才报错
+                    stop.set()
+                    raise
+            if stop.is_set():
+                raise DownloadCancelledError(f"下载已取消: {path}")
+        finally:
+            os.close(fd)
+
+
+def _probe_worker(
+    probe,
+    probe_end: int,
+    url: str,
+    headers: dict[str, Any],
+    fd: int,
+    ranges: "queue.Queue[tuple[int, int, int]]",
+    pbar: tqdm,
+    lock: Lock,
+    stop: Event,
+) -> None:
+    """
+    先写完探测请求拿到的第一段，再作为普通 worker 继续领区间
+    """
+    offset = _pwrite_body(probe, fd, 0, pbar, lock, stop)
+    _requeue_rest(ranges, offset, probe_end, _RANGE_RETRIES, stop)
+    _range_worker(url, headers, fd, ranges, pbar, lock, stop)
+
+
+def _range_worker(
+    url: str,
+    headers: dict[str, Any],
+    fd: int,
+    ranges: "queue.Queue[tuple[int, int, int]]",
+    pbar: tqdm,
+    lock: Lock,
+    stop: Event,
+) -> None:
+    """
+    不断从队列里取区间下载，直到队列为空或收到停止信号
+    """
+    while not stop.is_set():
+        try:
+            start, end, retries = ranges.get_nowait()
+        except queue.Empty:
+            return
+        with session.get(
+            url, headers={**headers, "Range": f"bytes={start}-{end}"}, stream=True
+        ) as resp:
+            resp.raise_for_status()
+            if resp.status_code != 206:
+                raise RuntimeError(f"Range 请求未返回 206: {resp.status_code}")
+            offset = _pwrite_body(resp, fd, start, pbar, lock, stop)
+        _requeue_rest(ranges, offset, end, retries, stop)
+
+
+def _requeue_rest(
+    ranges: "queue.Queue[tuple[int, int, int]]",
+    offset: int,
+    end: int,
+    retries: int,
+    stop: Event,
+) -> None:
+    """
+    区间中途断开时，把没写完的部分重新排队；重试次数用完就报错
+    """
+    if offset > end or stop.is_set():
+        return
+    if retries <= 0:
+        raise RuntimeError(f"区间 bytes={offset}-{end} 多次中断，下载失败")
+    ranges.put((offset, end, retries - 1))
+
+
+def _pwrite_body(
+    resp, fd: int, offset: int, pbar: tqdm, lock: Lock, stop: Event
+) -> int:
+    """
+    把响应体按偏移写入 fd，不共享文件指针。
+    返回写到的位置；连接中途断开或收到停止信号时提前返回，由调用方处理剩下的部分。
+    """
+    acc = 0
+    t0 = time.monotonic()
+    try:
+        for data in resp.iter_content(chunk_size=4 * 1024 * 1024):
+            if stop.is_set():
+                break
+            if not data:
+                continue
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(fd, view, offset)
+                view = view[written:]
+                offset += written
+            acc += len(data)
+            now = time.monotonic()
+            if acc >= _PBAR_FLUSH_BYTES or now - t0 > _PBAR_FLUSH_SECS:
+                with lock:
+                    pbar.update(acc)
+                acc = 0
+                t0 = now
+    except RequestException:
+        # 比如 ChunkedEncodingError：已写入的部分保留，剩下的交给调用方重新排队
+        pass
+    if acc:
+        with lock:
+            pbar.update(acc)
+    return offset
+
+
+def _content_range_total(content_range: str) -> Optional[int]:
+    """
+    从 "bytes 0-8388607/123456789" 里取出总长度，未知（"*"）时返回 None
+    """
+    _, _, size = content_range.rpartition("/")
+    return int(size) if size.isdigit() else None
+
+
+def _stream_download(
+    url: str, path: str, headers: dict[str, Any], desc: Optional[str], stop: Event
+) -> None:
+    """
+    单连接流式下载（不支持 Range 时的退路）
+    """
+    with session.get(url, headers=headers, stream=True) as resp:
+        resp.raise_for_status()
+        _write_stream(resp, path, desc, stop)
+
+
+def _write_stream(resp, path: str, desc: Optional[str], stop: Event) -> None:
+    # 长度直接取 GET 响应的 Content-Length，拿不到时 tqdm 只显示速率
+    total = int(resp.headers.get("Content-Length", 0)) or None
+    # 让 urllib3 负责解压，直接从 raw 流按块读写，省掉 iter_content 的生成器层
+    resp.raw.decode_content = True
+    with (
+        open(path, "wb") as f,
+        tqdm(
+            total=total,
+            unit="B",
+            unit_scale=True,
+            unit_divisor=1024,
+            mininterval=0.2,
+            desc=desc,
+        ) as pbar,
+    ):
+        if total:
+            _preallocate(f.fileno(), total)
+        out = CallbackIOWrapper(pbar.update, f, "write")
+        while True:
+            # 每块之间检查一次 stop，收到停止信号就放弃这次下载
+            if stop.is_set():
+                raise DownloadCancelledError(f"下载已取消: {path}")
+            block = resp.raw.read(4 * 1024 * 1024)
+            if not block:
+                break
+            out.write(block)
+        # 实际长度和 Content-Length 对不上时，截掉预分配多出来的部分
+        f.truncate()
+
+
+def _preallocate(fd: int, total: int) -> None:
+    """
+    一次性分配好磁盘空间，避免边写边扩展文件和产生碎片
+    """
+    try:
+        os.posix_fallocate(fd, 0, total)
+    except (AttributeError, OSError):
+        # 非 POSIX 平台或文件系统不支持时，至少先把长度设好
+        os.ftruncate(fd, total)
+
+
 def _sanitize_filename(name: str) -> str:
-    # Windows 下非法字符：\/:*?"<>| 另外我们把 / 也替换掉
-    return re.sub(r'[\\/:*?"<>|]', "_", name)
+    return _FN_BAD.sub("_", name)
+
+
+def _prefetch(path: str) -> None:
+    """
+    posix_fadvise(WILLNEED) 让内核异步预读整个文件；非 Linux 平台直接跳过
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
 
 def merge(name: str, av_path: str, audio_path: str, out_dir_path: str):
     """
     用 ffmpeg-python 合并视频和音频
     """
-    # 1) 确保输出目录存在
-    os.makedirs(out_dir_path, exist_ok=True)
+    # 1) 确保输出目录存在（默认 output 目录在导入时已创建）
+    if out_dir_path != _OUTPUT_DIR:
+        os.makedirs(out_dir_path, exist_ok=True)
 
     # 2) 清理文件名
     safe_name = _sanitize_filename(name)
     out_path = os.path.join(out_dir_path, f"{safe_name}.mp4")
 
-    # 3) 准备两个输入流
+    # 3) 提前把两个输入读进 page cache，和 ffmpeg 启动并行
+    _prefetch(av_path)
+    _prefetch(audio_path)
+
+    # 4) 准备两个输入流
     video = ffmpeg.input(av_path)
     audio = ffmpeg.input(audio_path)
 
-    # 4) 执行合并，capture stderr 方便调试
+    # 5) 执行合并（纯 stream copy），只保留错误日志，避免 stderr 里堆满进度输出
     try:
         (
             ffmpeg.output(video, audio, out_path, vcodec="copy", acodec="copy")
+            .global_args("-loglevel", "error", "-nostats")
             .overwrite_output()
             .run(capture_stdout=True, capture_stderr=True)
         )
@@ -3,10 +3,14 @@ import os
 import time
 import qrcode
 from datetime import datetime, timezone
-import json
+import orjson
 
 from session import session
 
+_LOGIN_COOKIES = ("SESSDATA", "bili_jct", "DedeUserID")
+
+os.makedirs("data", exist_ok=True)
+
 
 def get_qr_login() -> tuple[str, str]:
     """
@@ -87,41 +91,44 @@ def extract_login_cookies_with_expiry(session):
     返回形如：
     顺便，一般六个月过期
     {
-      "SESSDATA":   {"value": "...", "expires": "2025-07-12 08:23:45 UTC"},
-      "bili_jct":   {"value": "...", "expires": "2025-07-12 08:23:45 UTC"},
-      "DedeUserID": {"value": "...", "expires": "2025-07-12 08:23:45 UTC"},
+      "SESSDATA":   {"value": "...", "expires": "2025-07-12T08:23:45+00:00"},
+      "bili_jct":   {"value": "...", "expires": "2025-07-12T08:23:45+00:00"},
+      "DedeUserID": {"value": "...", "expires": "2025-07-12T08:23:45+00:00"},
     }
     """
-    result = {}
-    for name in ("SESSDATA", "bili_jct", "DedeUserID"):
-        # 找到第一个匹配主站域名的 Cookie
-        cookie = next(
-            (
-                c
-                for c in session.cookies
-                if c.name == name and c.domain.endswith(".bilibili.com")
-            ),
-            None,
-        )
-        if not cookie:
-            result[name] = {"value": None, "expires": None}
-            continue
+    # 只遍历一遍 cookie jar，每个名字取第一个匹配主站域名的 Cookie，三个都找到就停
+    found = {}
+    for c in session.cookies:
+        if (
+            c.name in _LOGIN_COOKIES
+            and c.name not in found
+            and c.domain.endswith(".bilibili.com")
+        ):
+            found[c.name] = c
+            if len(found) == len(_LOGIN_COOKIES):
+                break
 
-        # 过期时间
-        if cookie.expires is None:
-            exp_str = None  # 会话级 Cookie，无明确过期时间
-        else:
-            dt = datetime.fromtimestamp(cookie.expires, tz=timezone.utc)
-            exp_str = dt.strftime("%Y-%m-%d %H:%M:%S UTC")
+    return {name: _cookie_info(found.get(name)) for name in _LOGIN_COOKIES}
 
-        result[name] = {"value": cookie.value, "expires": exp_str}
-    return result
+
+def _cookie_info(cookie) -> dict[str, Optional[str]]:
+    if cookie is None:
+        return {"value": None, "expires": None}
+
+    # 过期时间
+    if cookie.expires is None:
+        exp_str = None  # 会话级 Cookie，无明确过期时间
+    else:
+        dt = datetime.fromtimestamp(cookie.expires, tz=timezone.utc)
+        exp_str = dt.isoformat()
+
+    return {"value": cookie.value, "expires": exp_str}
 
 
 def parse_login_info(file_path: str) -> dict[str, Any] | None:
     try:
-        with open(file_path, "r") as f:
-            return json.load(f)
+        with open(file_path, "rb") as f:
+            return orjson.loads(f.read())
     except FileNotFoundError:
         print(f"登录信息文件 {file_path} 不存在，开始新登录流程。")
         return None
@@ -131,23 +138,26 @@ def parse_utc(dt_str: str) -> datetime:
     """
     Parse an ISO 8601 datetime string to a timezone-aware UTC datetime object.
     """
-    return datetime.strptime(dt_str, "%Y-%m-%d %H:%M:%S %Z").replace(
-        tzinfo=timezone.utc
-    )
+    try:
+        return datetime.fromisoformat(dt_str).astimezone(timezone.utc)
+    except ValueError:
+        # 兼容旧版缓存里的 "2025-07-12 08:23:45 UTC" 格式
+        return datetime.strptime(dt_str, "%Y-%m-%d %H:%M:%S %Z").replace(
+            tzinfo=timezone.utc
+        )
 
 
 def login(file_path: str) -> dict[str, Any]:
     """
     主流程：检查本地缓存 → (未过期则直接加载到 session) → 否则走二维码登录流程 → 写回文件 → 返回 cookie info
     """
-    os.makedirs("data", exist_ok=True)
     temp_info = parse_login_info(file_path)
     if temp_info:
         try:
             now = datetime.now(timezone.utc)
             all_ok = all(
                 parse_utc(temp_info[name]["expires"]) > now
-                for name in ("SESSDATA", "bili_jct", "DedeUserID")
+                for name in _LOGIN_COOKIES
                 if temp_info[name]["expires"] is not None
             )
             if all_ok:
@@ -182,8 +192,8 @@ def login(file_path: str) -> dict[str, Any]:
         print(f"{k:10s}= {v['value']}\n  expires: {v['expires']}")
 
     # 4. 写回文件
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(info, f, ensure_ascii=False, indent=2)
+    with open(file_path, "wb") as f:
+        f.write(orjson.dumps(info, option=orjson.OPT_INDENT_2))
 
     return info
 
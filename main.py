@@ -1,3 +1,6 @@
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from threading import Event
+
 from login import login
 from utils import get_bv_info, extract_bv
 from download_merge import download_video, download_audio, merge
@@ -19,7 +22,23 @@ if __name__ == "__main__":
         infos["DedeUserID"]["value"],
     )
 
-    v_path: str = download_video(**bv_info["get_video_infos"]())
-    a_path: str = download_audio(**bv_info["get_audio_infos"]())
+    # 视频和音频同时下载，音频通常在视频下完之前就结束了
+    stop = Event()
+    pool = ThreadPoolExecutor(max_workers=2)
+    v_future = pool.submit(download_video, **bv_info["get_video_infos"](), stop=stop)
+    a_future = pool.submit(download_audio, **bv_info["get_audio_infos"](), stop=stop)
+    try:
+        done, _ = wait((v_future, a_future), return_when=FIRST_EXCEPTION)
+        for fut in done:
+            fut.result()
+    except BaseException:
+        # 一路失败或 Ctrl-C：通知两路下载尽快停下，等线程退出后再抛出原异常
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+    v_path: str = v_future.result()
+    a_path: str = a_future.result()
 
     merge(bv_info["title"], av_path=v_path, audio_path=a_path, out_dir_path="output")
@@ -23,4 +23,7 @@ retry = Retry(
     status_forcelist=[500, 502, 503, 504],
     allowed_methods=["GET", "POST"],
 )
-session.mount("https://", HTTPAdapter(max_retries=retry))
+# 视频/音频同时多连接分段下载，连接池要够大，否则多出的连接用完即关
+session.mount(
+    "https://", HTTPAdapter(max_retries=retry, pool_connections=20, pool_maxsize=20)
+)
@@ -1,65 +1,18 @@
 from typing import Any, List, Dict, Optional
 import requests
-import json
 import re
+import orjson
 from requests.exceptions import SSLError, RequestException
-from urllib3.exceptions import MaxRetryError
 
 from cus_exceptions import AidRetrievalError, CidRetrievalError, VideoNotFoundError
 from login import session
 
+# 不挂 Retry adapter 的备用 session，只在 SSL 降级时使用
+_no_retry = requests.Session()
+_no_retry.headers.update(session.headers)
 
-def _get_header(
-    bvid: str, sess_data: str, bili_jct: str, dede_user_id: str
-) -> dict[str, Any]:
-    """
-    构造带登录态的 header，包含你完整复制的所有 Cookie。
-    """
-    return {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/114.0.0.0 Safari/537.36"
-        ),
-        "Referer": f"https://www.bilibili.com/video/{bvid}?p=1",
-        "Accept": "application/json, text/plain, */*",
-        "Accept-Language": "zh-CN,zh;q=0.9",
-        "Cookie": (
-            "enable_web_push=DISABLE; "
-            "buvid4=8304DBFC-7EF8-F9BC-14F7-9DDAC80DA37954307-023100511-VdSZDbI3OC7ZiyoQAwmACA%3D%3D; "
-            "buvid_fp_plain=undefined; "
-            "is-2022-channel=1; "
-            "CURRENT_BLACKGAP=0; "
-            f"DedeUserID={dede_user_id}; "
-            "DedeUserID__ckMd5=431600431a432e63; "
-            f"SESSDATA={sess_data}; "
-            f"bili_jct={bili_jct}; "
-            "enable_feed_channel=ENABLE; "
-            "_uuid=15D52EE9-1A15-71FD-FF1F-2E336273715339217infoc; "
-            "hit-dyn-v2=1; "
-            "rpdid=|(J~Rllk~)l)0J'u~RY||R~Yu; "
-            "buvid3=8712A290-56E3-42C4-0688-CCB63730A5DC91931infoc; "
-            "b_nut=1746111291; "
-            "CURRENT_QUALITY=80; "
-            "header_theme_version=OPEN; "
-            "theme-tip-show=SHOWED; "
-            "theme-avatar-tip-show=SHOWED; "
-            "LIVE_BUVID=AUTO9017478208868957; "
-            "fingerprint=7615b2448e54a09b1ee3944d4ae6049f; "
-            "buvid_fp=3bd278045d8390e6de887c297b5af287; "
-            "PVID=3; "
-            "bili_ticket=eyJhbGciOiJIUzI1NiIsImtpZCI6InMwMyIsInR5cCI6IkpXVCJ9."
-            "eyJleHAiOjE3NTA2NTgwMDEsImlhdCI6MTc1MDM5ODc0MSwicGx0IjotMX0."
-            "_H3OF9LHybLT1V4prpKJLDKeTs4wsbhHUSlb-XoM-is; "
-            "bili_ticket_expires=1750657941; "
-            "home_feed_column=5; "
-            "browser_resolution=1659-811; "
-            "sid=6pat9nc9; "
-            "CURRENT_FNVAL=4048; "
-            "b_lsid=1071EB3C9_197927897F6; "
-            "bp_t_offset_183894189=1080935962940276736"
-        ),
-    }
+_BV_RE = re.compile(r"(BV[0-9A-Za-z]{10,})")
+_PLAYINFO_RE = re.compile(rb"window\.__playinfo__\s*=\s*({.+?})\s*</script>", re.S)
 
 
 def get_aid_cid(bvid: str) -> tuple[int, int]:
@@ -67,9 +20,7 @@ def get_aid_cid(bvid: str) -> tuple[int, int]:
     通过 web-interface/view 接口拿 aid, cid
     """
     url = "https://api.bilibili.com/x/web-interface/view"
-    resp = requests.get(
-        url, params={"bvid": bvid}, headers={"User-Agent": "Mozilla/5.0"}, timeout=5
-    )
+    resp = session.get(url, params={"bvid": bvid}, timeout=5)
     resp.raise_for_status()
     js = resp.json()
     data = js.get("data", {})
@@ -108,7 +59,7 @@ def _get_quality_list(
         "high_quality": 1,  # MP4 需加 high_quality
     }
 
-    resp = requests.get(
+    resp = session.get(
         "https://api.bilibili.com/x/player/playurl",
         headers=headers,
         params=params,
@@ -122,44 +73,59 @@ def _get_quality_list(
 
 def _safe_get(url: str, **kwargs) -> requests.Response:
     """
-    三轮尝试：
-      1) 普通 session.get（带 retry adapter）
-      2) verify=False
-      3) 不走 Retry adapter，直接 requests.get
+    正常情况直接走 session.get（带 retry adapter）；
+    只有 SSL 出错时才进入 _safe_get_fallback 降级重试
     """
-    # 先把 retry adapter 保留在 session 上
     try:
         resp = session.get(url, **kwargs)
+    except SSLError as e:
+        return _safe_get_fallback(url, e, **kwargs)
+    resp.raise_for_status()
+    return resp
+
+
+def _safe_get_fallback(url: str, e1: SSLError, **kwargs) -> requests.Response:
+    """
+    SSL 出错后的两轮降级：
+      1) session.get verify=False
+      2) 不走 Retry adapter，直接用 _no_retry
+    """
+    kwargs.pop("verify", None)
+    try:
+        resp = session.get(url, verify=False, **kwargs)
         resp.raise_for_status()
         return resp
-    except (SSLError, MaxRetryError, RequestException) as e1:
-        # 1) SSL 错误或重试失败，尝试关闭验证
+    except RequestException as e2:
         try:
-            resp = session.get(
-                url, verify=False, **{k: v for k, v in kwargs.items() if k != "verify"}
-            )
+            resp = _no_retry.get(url, verify=False, **kwargs)
             resp.raise_for_status()
             return resp
-        except (SSLError, MaxRetryError, RequestException) as e2:
-            # 2) 再次失败，临时移除 retry adapter 再试一次
-            no_retry = requests.Session()
-            no_retry.headers.update(session.headers)
-            try:
-                resp = no_retry.get(
-                    url,
-                    verify=False,
-                    **{k: v for k, v in kwargs.items() if k != "verify"},
-                )
-                resp.raise_for_status()
-                return resp
-            except Exception as e3:
-                # 3) 三次都挂了，就包装抛出
-                raise RuntimeError(
-                    f"三次尝试均失败:\n"
-                    f"1) 普通 session.get → {e1}\n"
-                    f"2) session.get verify=False → {e2}\n"
-                    f"3) plain requests.get → {e3}"
-                )
+        except Exception as e3:
+            # 三次都挂了，就包装抛出
+            raise RuntimeError(
+                f"三次尝试均失败:\n"
+                f"1) 普通 session.get → {e1}\n"
+                f"2) session.get verify=False → {e2}\n"
+                f"3) plain requests.get → {e3}"
+            )
+
+
+def _get_playinfo_from_html(bvid: str) -> Dict[str, Any]:
+    """
+    从视频页面 HTML 的 window.__playinfo__ 里提取 playinfo
+    """
+    page_url = f"https://www.bilibili.com/video/{bvid}"
+    try:
+        resp = _safe_get(page_url, timeout=10)
+        # 直接在 bytes 上匹配，省掉整页 HTML 的 UTF-8 解码
+        html = resp.content
+    except RequestException as e:
+        raise RuntimeError(f"无法获取视频页面 HTML: {e}")
+
+    m = _PLAYINFO_RE.search(html)
+    if not m:
+        raise RuntimeError("无法从 HTML 中提取 playinfo 数据")
+    return orjson.loads(m.group(1))
 
 
 def get_bv_info(
@@ -174,32 +140,39 @@ def get_bv_info(
         }
     )
 
-    # 1) 拿页面 HTML（同样用 _safe_get）
-    page_url = f"https://www.bilibili.com/video/{bvid}"
+    # 1) view 接口一次拿到 cid 和标题
+    info_api = "https://api.bilibili.com/x/web-interface/view"
     try:
-        resp = _safe_get(page_url, timeout=10)
-        html = resp.text
-    except RequestException as e:
-        raise RuntimeError(f"无法获取视频页面 HTML: {e}")
+        info_resp = _safe_get(info_api, params={"bvid": bvid}, timeout=5)
+        view = orjson.loads(info_resp.content).get("data") or {}
+    except (RequestException, orjson.JSONDecodeError) as e:
+        raise RuntimeError(f"无法获取视频信息: {e}")
+    title = view.get("title", "")
+    cid = view.get("cid")
 
-    # 2) 从 HTML 提取 playinfo
-    m = re.search(r"window\.__playinfo__\s*=\s*({.+?})\s*</script>", html, re.S)
-    if not m:
-        raise RuntimeError("无法从 HTML 中提取 playinfo 数据")
-    playinfo = json.loads(m.group(1))
+    # 2) playurl 接口直接返回 dash，不用再抓整页 HTML
+    playinfo = None
+    if cid is not None:
+        params = {"bvid": bvid, "cid": cid, "qn": 80, "fnval": 4048, "fourk": 1}
+        try:
+            resp = _safe_get(
+                "https://api.bilibili.com/x/player/playurl", params=params, timeout=5
+            )
+            js = orjson.loads(resp.content)
+            if js.get("code") == 0:
+                playinfo = js
+        except (RequestException, RuntimeError, orjson.JSONDecodeError):
+            pass
+
+    # 3) 接口拿不到（风控等）时，退回从页面 HTML 提取 playinfo
+    if playinfo is None:
+        playinfo = _get_playinfo_from_html(bvid)
 
     dash = playinfo.get("data", {}).get("dash", {})
     video_url = dash.get("video", [{}])[0].get("baseUrl")
     audio_url = dash.get("audio", [{}])[0].get("baseUrl")
     qualities = playinfo.get("data", {}).get("accept_quality", [])
 
-    info_api = f"https://api.bilibili.com/x/web-interface/view?bvid={bvid}"
-    try:
-        info_resp = _safe_get(info_api, timeout=5)
-        title = info_resp.json().get("data", {}).get("title", "")
-    except RequestException as e:
-        raise RuntimeError(f"无法获取视频信息: {e}")
-
     return {
         "title": title,
         "video_url": video_url,
@@ -219,5 +192,11 @@ def get_bv_info(
 
 
 def extract_bv(url: str) -> Optional[str]:
-    m = re.search(r"(BV[0-9A-Za-z]{10,})", url)
-    return m.group(1) if m else None
+    # 先用 find 定位字面量 "BV"，再从该位置锚定匹配
+    idx = url.find("BV")
+    while idx >= 0:
+        m = _BV_RE.match(url, idx)
+        if m:
+            return m.group(1)
+        idx = url.find("BV", idx + 2)
+    return None